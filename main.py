@@ -1,13 +1,25 @@
 # main.py
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from services.stock_service import (
     fetch_historical_ohlcv, 
     fetch_realtime_latest, 
     fetch_multiple_symbols,
-    get_symbol_info
+    get_symbol_info,
+    RateLimitError,
+    HISTORY_CACHE_TTL
 )
-from typing import Optional, List
+from typing import Optional, List, Dict
+from contextlib import asynccontextmanager
+import pandas as pd
+import numpy as np
+import orjson
+import anyio
+import asyncio
+import hashlib
+import re
 import uvicorn
 import logging
 from datetime import datetime
@@ -18,10 +30,31 @@ import sys
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Max concurrent blocking yfinance calls per process (anyio default is 40)
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", "200"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize API on startup"""
+    try:
+        logger.info("Starting iMarketPredict Stock API...")
+        anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+        logger.info("Database features disabled - running in read-only mode")
+        logger.info("All data is fetched directly from Yahoo Finance")
+        logger.info("API startup completed successfully")
+        
+    except Exception as e:
+        logger.error(f"Startup error: {e}")
+        logger.info("API will continue to run but some features may be limited")
+    
+    yield
+
 app = FastAPI(
     title="iMarketPredict Stock API",
     description="API for fetching real-time and historical stock data from Yahoo Finance - No Database Required",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -33,53 +66,136 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(RateLimitError)
+async def rate_limit_handler(request: Request, exc: RateLimitError):
+    """Pass Yahoo Finance throttling on to the client instead of retrying upstream"""
+    return ORJSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 # Default ticker symbols
 DEFAULT_TICKERS = ["AAPL", "MSFT", "GOOGL", "AMZN", "TSLA", "META", "NVDA", "NFLX"]
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize API on startup"""
-    try:
-        logger.info("Starting iMarketPredict Stock API...")
-        logger.info("Database features disabled - running in read-only mode")
-        logger.info("All data is fetched directly from Yahoo Finance")
-        logger.info("API startup completed successfully")
-        
-    except Exception as e:
-        logger.error(f"Startup error: {e}")
-        logger.info("API will continue to run but some features may be limited")
+# Static response bodies, built once; handlers only add the current timestamp
+_ROOT_PAYLOAD = {
+    "message": "iMarketPredict Stock API",
+    "version": "1.0.0",
+    "status": "running",
+    "database": "disabled",
+    "endpoints": {
+        "health": "/health",
+        "stock_history": "/stock/{symbol}/history",
+        "stock_history_stream": "/stock/{symbol}/history/stream",
+        "stock_latest": "/stock/{symbol}/latest",
+        "stock_info": "/stock/{symbol}/info",
+        "batch_history": "/batch/{symbols}/history"
+    },
+    "note": "This API fetches data directly from Yahoo Finance - no database storage"
+}
+
+_HEALTH_PAYLOAD = {
+    "status": "healthy",
+    "database": "disabled",
+    "message": "API is running successfully - fetching data from Yahoo Finance"
+}
+
+_SUGGESTED_PAYLOAD = {
+    "suggested_symbols": DEFAULT_TICKERS,
+    "count": len(DEFAULT_TICKERS),
+    "note": "These are popular stock symbols you can test with"
+}
+
+_TEST_PAYLOAD = {
+    "message": "API is working!",
+    "status": "success"
+}
+
+# Comma-separated ticker list; malformed entries (spaces, quotes, overlong) are dropped
+_SYMBOLS_RE = re.compile(r"(?:^|,)\s*([A-Z0-9.^=\-]{1,12})\s*(?=,|$)")
+
+# Columns narrowed by _compact_prices before serialization
+PRICE_COLUMNS = ("open", "high", "low", "close")
+
+def _compact_prices(values: np.ndarray) -> np.ndarray:
+    """
+    Yahoo's prices are float32 values widened to float64, which orjson writes as
+    189.25999450683594; as float32 they come out as 189.26.
+    Only narrowed when every value round-trips exactly, so no price loses precision.
+    """
+    narrow = values.astype(np.float32)
+    return narrow if np.array_equal(narrow.astype(np.float64), values) else values
+
+def _to_records(df: pd.DataFrame) -> List[dict]:
+    """
+    Build row dicts straight from the column arrays.
+    Values stay numpy scalars, which orjson encodes natively without per-cell boxing.
+    """
+    columns = {name: df[name].to_numpy() for name in df.columns}
+    for name in PRICE_COLUMNS:
+        if name in columns:
+            columns[name] = _compact_prices(columns[name])
+    if "dt" in columns:
+        columns["dt"] = df["dt"].map(pd.Timestamp.isoformat).to_numpy()
+    names = list(columns)
+    return [dict(zip(names, row)) for row in zip(*columns.values())]
+
+def _history_etag(df: pd.DataFrame, symbol: str, period: str, interval: str, limit: Optional[int]) -> str:
+    """
+    ETag for a history response, derived from the request and the newest bar.
+    The last bar's close/volume are included because today's bar keeps changing until the close.
+    """
+    last = df.iloc[-1]
+    fingerprint = f"{symbol.upper()}:{period}:{interval}:{limit}:{len(df)}:{last['dt']}:{last['close']}:{last['volume']}"
+    return '"' + hashlib.blake2b(fingerprint.encode(), digest_size=8).hexdigest() + '"'
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """Check the request's If-None-Match header against an ETag"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+# Rows serialized per chunk when streaming history
+STREAM_CHUNK_ROWS = 1000
+
+def _iter_ndjson(df: pd.DataFrame):
+    """Yield history rows as newline-delimited JSON, converting one chunk of rows at a time"""
+    for start in range(0, len(df), STREAM_CHUNK_ROWS):
+        rows = _to_records(df.iloc[start:start + STREAM_CHUNK_ROWS])
+        yield b"".join(orjson.dumps(row, option=orjson.OPT_SERIALIZE_NUMPY) + b"\n" for row in rows)
+
+# Upstream fetches currently in progress, keyed by request identity
+_inflight: Dict[str, asyncio.Task] = {}
+
+async def _single_flight(key: str, func, *args, **kwargs):
+    """
+    Run func in the threadpool at most once per key at a time.
+    Concurrent callers with the same key await the same result instead of each hitting Yahoo Finance.
+    """
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(run_in_threadpool(func, *args, **kwargs))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    # Shield so one disconnecting client does not cancel the fetch for everyone else
+    return await asyncio.shield(task)
 
 @app.get("/")
-def root():
+async def root():
     """Root endpoint with API information"""
-    return {
-        "message": "iMarketPredict Stock API",
-        "version": "1.0.0",
-        "status": "running",
-        "database": "disabled",
-        "timestamp": datetime.now().isoformat(),
-        "endpoints": {
-            "health": "/health",
-            "stock_history": "/stock/{symbol}/history",
-            "stock_latest": "/stock/{symbol}/latest",
-            "stock_info": "/stock/{symbol}/info",
-            "batch_history": "/batch/{symbols}/history"
-        },
-        "note": "This API fetches data directly from Yahoo Finance - no database storage"
-    }
+    return ORJSONResponse({**_ROOT_PAYLOAD, "timestamp": datetime.now().isoformat()})
 
 @app.get("/health")
-def health_check():
+async def health_check():
     """Health check endpoint"""
-    return {
-        "status": "healthy",
-        "database": "disabled",
-        "timestamp": datetime.now().isoformat(),
-        "message": "API is running successfully - fetching data from Yahoo Finance"
-    }
+    return ORJSONResponse({**_HEALTH_PAYLOAD, "timestamp": datetime.now().isoformat()})
 
 @app.get("/stock/{symbol}/history")
-def get_history(
+async def get_history(
+    request: Request,
     symbol: str, 
     period: str = Query("1d", description="Time period: 1d, 5d, 1mo, 3mo, 6mo, 1y, 5y, 10y, max"),
     interval: str = Query("1d", description="Data interval: 1m, 2m, 5m, 15m, 1h, 1d"),
@@ -89,36 +205,77 @@ def get_history(
     try:
         logger.info(f"Fetching history for {symbol} - period: {period}, interval: {interval}")
         
-        df = fetch_historical_ohlcv(symbol, period=period, interval=interval)
+        df = await run_in_threadpool(fetch_historical_ohlcv, symbol, period=period, interval=interval)
         if df.empty:
             raise HTTPException(status_code=404, detail=f"No data found for symbol {symbol}")
         
+        # Past bars never change, so clients can revalidate instead of re-downloading
+        etag = _history_etag(df, symbol, period, interval, limit)
+        cache_headers = {
+            "ETag": etag,
+            # Today's bar (daily intervals included) still moves, so freshness matches the server cache
+            "Cache-Control": f"public, max-age={HISTORY_CACHE_TTL}"
+        }
+        if _etag_matches(request, etag):
+            return Response(status_code=304, headers=cache_headers)
+        
+        # Only convert the rows that will be returned
+        total_records = len(df)
+        if limit and total_records > limit:
+            df = df.tail(limit)
+        
         # Return data directly from Yahoo Finance
-        data = df.to_dict(orient="records")
-        return {
+        data = _to_records(df)
+        return ORJSONResponse({
             "symbol": symbol.upper(),
             "period": period,
             "interval": interval,
-            "total_records": len(data),
-            "rows": data[-limit:] if limit else data,
+            "total_records": total_records,
+            "rows": data,
             "timestamp": datetime.now().isoformat(),
             "source": "Yahoo Finance",
             "stored": False
-        }
+        }, headers=cache_headers)
         
-    except HTTPException:
+    except (HTTPException, RateLimitError):
         raise
     except Exception as e:
         logger.error(f"Error fetching history for {symbol}: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch data for {symbol}")
 
+@app.get("/stock/{symbol}/history/stream")
+async def stream_history(
+    symbol: str, 
+    period: str = Query("1d", description="Time period: 1d, 5d, 1mo, 3mo, 6mo, 1y, 5y, 10y, max"),
+    interval: str = Query("1d", description="Data interval: 1m, 2m, 5m, 15m, 1h, 1d"),
+    limit: Optional[int] = Query(None, description="Maximum number of records to return (default: all)")
+):
+    """Stream historical OHLCV data as newline-delimited JSON, one row per line"""
+    try:
+        logger.info(f"Streaming history for {symbol} - period: {period}, interval: {interval}")
+        
+        df = await run_in_threadpool(fetch_historical_ohlcv, symbol, period=period, interval=interval)
+        if df.empty:
+            raise HTTPException(status_code=404, detail=f"No data found for symbol {symbol}")
+        
+        if limit and len(df) > limit:
+            df = df.tail(limit)
+        
+        return StreamingResponse(_iter_ndjson(df), media_type="application/x-ndjson")
+        
+    except (HTTPException, RateLimitError):
+        raise
+    except Exception as e:
+        logger.error(f"Error streaming history for {symbol}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch data for {symbol}")
+
 @app.get("/stock/{symbol}/latest")
-def get_latest(symbol: str):
+async def get_latest(symbol: str):
     """Get latest real-time data for a symbol"""
     try:
         logger.info(f"Fetching latest data for {symbol}")
         
-        latest = fetch_realtime_latest(symbol)
+        latest = await _single_flight(f"latest:{symbol.upper()}", fetch_realtime_latest, symbol)
         if not latest:
             raise HTTPException(status_code=404, detail=f"No real-time data found for symbol {symbol}")
         
@@ -129,19 +286,19 @@ def get_latest(symbol: str):
             "stored": False
         }
         
-    except HTTPException:
+    except (HTTPException, RateLimitError):
         raise
     except Exception as e:
         logger.error(f"Error fetching latest data for {symbol}: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch latest data for {symbol}")
 
 @app.get("/stock/{symbol}/info")
-def get_stock_info(symbol: str):
+async def get_stock_info(symbol: str):
     """Get company information for a symbol"""
     try:
         logger.info(f"Fetching company info for {symbol}")
         
-        info = get_symbol_info(symbol)
+        info = await run_in_threadpool(get_symbol_info, symbol)
         if not info:
             raise HTTPException(status_code=404, detail=f"No company information found for symbol {symbol}")
         
@@ -151,27 +308,28 @@ def get_stock_info(symbol: str):
             "source": "Yahoo Finance"
         }
         
-    except HTTPException:
+    except (HTTPException, RateLimitError):
         raise
     except Exception as e:
         logger.error(f"Error fetching company info for {symbol}: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch company information for {symbol}")
 
 @app.get("/batch/{symbols}/history")
-def get_batch_history(
+async def get_batch_history(
     symbols: str,
     period: str = Query("1d", description="Time period"),
     interval: str = Query("1h", description="Data interval")
 ):
     """Get historical data for multiple symbols (comma-separated)"""
     try:
-        symbol_list = [s.strip().upper() for s in symbols.split(",") if s.strip()]
+        symbol_list = _SYMBOLS_RE.findall(symbols.upper())
         if not symbol_list:
             raise HTTPException(status_code=400, detail="No valid symbols provided")
         
         logger.info(f"Fetching batch history for symbols: {symbol_list}")
         
-        results = fetch_multiple_symbols(symbol_list, period=period, interval=interval)
+        # Chunked yfinance downloads run off the event loop
+        results = await run_in_threadpool(fetch_multiple_symbols, symbol_list, period=period, interval=interval)
         
         if not results:
             raise HTTPException(status_code=404, detail="No data found for any of the specified symbols")
@@ -181,42 +339,33 @@ def get_batch_history(
         for symbol, df in results.items():
             response_data[symbol] = {
                 "total_records": len(df),
-                "rows": df.to_dict(orient="records")
+                "rows": _to_records(df)
             }
         
-        return {
+        return ORJSONResponse({
             "symbols": symbol_list,
             "period": period,
             "interval": interval,
             "data": response_data,
             "timestamp": datetime.now().isoformat(),
             "source": "Yahoo Finance"
-        }
+        })
         
-    except HTTPException:
+    except (HTTPException, RateLimitError):
         raise
     except Exception as e:
         logger.error(f"Error in batch history fetch: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch batch data: {str(e)}")
 
 @app.get("/symbols/suggested")
-def get_suggested_symbols():
+async def get_suggested_symbols():
     """Get list of suggested popular stock symbols"""
-    return {
-        "suggested_symbols": DEFAULT_TICKERS,
-        "count": len(DEFAULT_TICKERS),
-        "timestamp": datetime.now().isoformat(),
-        "note": "These are popular stock symbols you can test with"
-    }
+    return ORJSONResponse({**_SUGGESTED_PAYLOAD, "timestamp": datetime.now().isoformat()})
 
 @app.get("/test")
-def test_endpoint():
+async def test_endpoint():
     """Simple test endpoint"""
-    return {
-        "message": "API is working!",
-        "timestamp": datetime.now().isoformat(),
-        "status": "success"
-    }
+    return ORJSONResponse({**_TEST_PAYLOAD, "timestamp": datetime.now().isoformat()})
 
 if __name__ == "__main__":
     print("=" * 60)
@@ -239,6 +388,11 @@ if __name__ == "__main__":
     # Check if running on Windows and disable reload if needed
     is_windows = os.name == 'nt'
     
+    # Auto-reload is for development only (UVICORN_RELOAD=1) and always runs a single worker.
+    # loop/http stay at uvicorn's "auto", which picks uvloop/httptools whenever they are installed
+    reload = not is_windows and os.getenv("UVICORN_RELOAD") == "1"
+    workers = 1 if reload else int(os.getenv("WEB_CONCURRENCY", (os.cpu_count() or 1) * 2 + 1))
+    
     try:
         if is_windows:
             print("Running on Windows - disabling reload feature for stability")
@@ -247,6 +401,7 @@ if __name__ == "__main__":
                 host="0.0.0.0", 
                 port=8000,  # Back to original port 8000
                 reload=False,  # Disable reload on Windows
+                workers=workers,
                 log_level="info"
             )
         else:
@@ -254,7 +409,8 @@ if __name__ == "__main__":
                 "main:app", 
                 host="0.0.0.0", 
                 port=8000,  # Back to original port 8000
-                reload=True,
+                reload=reload,
+                workers=workers,
                 log_level="info"
             )
     except Exception as e:
@@ -2,19 +2,46 @@
 """
 Simple startup script for iMarketPredict Stock API
 """
+import os
+import shutil
+import socket
 import subprocess
 import sys
-import time
-import requests
+from importlib.util import find_spec
 
-def test_api_endpoint(url, timeout=5):
-    """Test if API endpoint is responding"""
+# Modules the Full API (main.py) needs to start
+FULL_API_PACKAGES = ["fastapi", "uvicorn", "yfinance", "pandas", "orjson", "cachetools"]
+
+def port_in_use(port, host="127.0.0.1"):
+    """Check whether something is already listening on the port (a TCP connect, no HTTP request)"""
     try:
-        response = requests.get(url, timeout=timeout)
-        return response.status_code == 200
-    except:
+        with socket.create_connection((host, port), timeout=1):
+            return True
+    except OSError:
         return False
 
+def missing_packages(packages):
+    """Return the packages that are not installed, without importing them"""
+    return [name for name in packages if find_spec(name) is None]
+
+def full_api_command():
+    """
+    Command line for running the Full API in production mode.
+    Uses gunicorn with --preload when available so workers share the imported app
+    copy-on-write; otherwise falls back to main.py's multi-worker uvicorn.
+    """
+    workers = os.getenv("WEB_CONCURRENCY", str((os.cpu_count() or 1) * 2 + 1))
+    gunicorn = shutil.which("gunicorn")
+    if gunicorn and os.name != "nt":
+        return [
+            gunicorn, "main:app",
+            "--worker-class", "uvicorn.workers.UvicornWorker",
+            "--workers", workers,
+            "--bind", "0.0.0.0:8000",
+            "--preload"
+        ]
+    return [sys.executable, "main.py"]
+
 def main():
     print("=== iMarketPredict Stock API Launcher ===\n")
     
@@ -47,45 +74,44 @@ def main():
     elif choice == "3":
         print("\nAuto-detecting best option...")
         
-        # Try to start main API
-        print("Attempting to start Full API...")
+        if port_in_use(8000):
+            print("✗ Port 8000 is already in use - is the API already running?")
+            print("Check with: http://localhost:8000/health")
+            return
+        
+        missing = missing_packages(FULL_API_PACKAGES)
+        if missing:
+            print(f"✗ Full API unavailable - missing packages: {', '.join(missing)}")
+        else:
+            # Hand this process over to the API server instead of keeping a launcher alive
+            print("Attempting to start Full API...")
+            print("API available at: http://localhost:8000")
+            print("Test with: http://localhost:8000/stock/AAPL/latest")
+            print("\nPress Ctrl+C to stop the API")
+            command = full_api_command()
+            try:
+                if os.name != "nt":
+                    sys.stdout.flush()
+                    os.execv(command[0], command)
+                subprocess.run(command, check=True)
+                return
+            except KeyboardInterrupt:
+                print("\nAPI stopped")
+                return
+            except Exception as e:
+                print(f"Full API failed: {e}")
+        
+        print("\nTrying Test API...")
         try:
-            process = subprocess.Popen([sys.executable, "main.py"])
-            
-            # Wait a bit for startup
-            time.sleep(3)
-            
-            # Test if it's working
-            if test_api_endpoint("http://localhost:8000/health"):
-                print("✓ Full API is running successfully!")
-                print("API available at: http://localhost:8000")
-                print("Test with: http://localhost:8000/stock/AAPL/latest")
-                print("\nPress Ctrl+C to stop the API")
-                
-                try:
-                    process.wait()
-                except KeyboardInterrupt:
-                    process.terminate()
-                    print("\nAPI stopped")
-            else:
-                print("✗ Full API failed to start properly")
-                process.terminate()
-                
-                # Try test API
-                print("\nTrying Test API...")
-                subprocess.run([sys.executable, "test_api.py"], check=True)
-                
+            subprocess.run([sys.executable, "test_api.py"], check=True)
+        except KeyboardInterrupt:
+            print("\nAPI stopped by user")
         except Exception as e:
-            print(f"Full API failed: {e}")
-            print("\nTrying Test API...")
-            try:
-                subprocess.run([sys.executable, "test_api.py"], check=True)
-            except Exception as e2:
-                print(f"Test API also failed: {e2}")
-                print("\nTroubleshooting:")
-                print("1. Check if port 8000 is available")
-                print("2. Verify all dependencies are installed: pip install -r requirements.txt")
-                print("3. Check the logs for specific errors")
+            print(f"Test API also failed: {e}")
+            print("\nTroubleshooting:")
+            print("1. Check if port 8000 is available")
+            print("2. Verify all dependencies are installed: pip install -r requirements.txt")
+            print("3. Check the logs for specific errors")
     
     else:
         print("Invalid choice. Please run the script again.")
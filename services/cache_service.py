@@ -0,0 +1,137 @@
+# services/cache_service.py
+import os
+import pickle
+import inspect
+import logging
+import threading
+import time
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Union
+
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Optional shared cache tier - set REDIS_URL (e.g. redis://localhost:6379/0) to enable
+REDIS_URL = os.getenv("REDIS_URL")
+
+# In-process tier: absorbs bursts of duplicate requests without a network hop
+LOCAL_CACHE_SIZE = 512
+LOCAL_CACHE_TTL = 30
+
+# Seconds to skip the Redis tier after it fails to connect or times out
+REDIS_RETRY_AFTER = 30
+
+_redis_client = None
+_redis_disabled = False
+_redis_down_until = 0.0
+_redis_lock = threading.Lock()
+
+def _get_redis():
+    """Return a shared Redis client, or None when Redis is not configured/available"""
+    global _redis_client, _redis_disabled
+    if not REDIS_URL or _redis_disabled or time.monotonic() < _redis_down_until:
+        return None
+    if _redis_client is None:
+        with _redis_lock:
+            if _redis_client is None:
+                try:
+                    import redis
+                    # The client connects lazily, so these bound every get/set against a dead server
+                    _redis_client = redis.Redis.from_url(REDIS_URL, socket_timeout=1, socket_connect_timeout=1)
+                except Exception as e:
+                    logger.warning(f"Redis cache unavailable, using in-process cache only: {e}")
+                    _redis_disabled = True
+                    return None
+    return _redis_client
+
+def _redis_failed(action: str, key: str, error: Exception) -> None:
+    """Log a Redis error; connection problems also take the Redis tier out for REDIS_RETRY_AFTER"""
+    global _redis_down_until
+    import redis
+    if isinstance(error, (redis.ConnectionError, redis.TimeoutError)):
+        _redis_down_until = time.monotonic() + REDIS_RETRY_AFTER
+        logger.warning(f"Redis unreachable, using in-process cache only for {REDIS_RETRY_AFTER}s: {error}")
+    else:
+        logger.warning(f"Redis {action} failed for {key}: {error}")
+
+def _is_empty(value: Any) -> bool:
+    """Empty results (no data / failed fetch) are never cached"""
+    empty = getattr(value, "empty", None)
+    if isinstance(empty, bool):
+        return empty
+    return not value
+
+def make_key(namespace: str, symbol: str, period: Optional[str] = None, interval: Optional[str] = None) -> str:
+    """Build a cache key of the form '{namespace}:{SYMBOL}:{period}:{interval}'"""
+    return f"{namespace}:{symbol.upper()}:{period}:{interval}"
+
+def cached(ttl: Union[int, Callable[[Optional[str], Optional[str]], int]], namespace: Optional[str] = None) -> Callable:
+    """
+    Cache the result of a fetch function keyed by (symbol, period, interval).
+    Functions taking a list of symbols are keyed by the comma-joined list.
+    ttl is either a number of seconds or a function of (period, interval) returning one.
+    Lookups go to a small in-process TTL cache first, then Redis (if REDIS_URL is set),
+    and only call the wrapped function on a miss in both tiers.
+    """
+    def decorator(func: Callable) -> Callable:
+        prefix = namespace or func.__name__
+        signature = inspect.signature(func)
+        local_caches: Dict[int, TTLCache] = {}
+        local_lock = threading.Lock()
+
+        def local_cache(seconds: int) -> TTLCache:
+            cache = local_caches.get(seconds)
+            if cache is None:
+                local_ttl = min(seconds, LOCAL_CACHE_TTL) if REDIS_URL else seconds
+                cache = local_caches[seconds] = TTLCache(maxsize=LOCAL_CACHE_SIZE, ttl=local_ttl)
+            return cache
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            params = bound.arguments
+            period, interval = params.get("period"), params.get("interval")
+            symbol = params["symbol"] if "symbol" in params else ",".join(params["symbols"])
+            key = make_key(prefix, symbol, period, interval)
+            seconds = ttl(period, interval) if callable(ttl) else ttl
+
+            with local_lock:
+                local = local_cache(seconds)
+                value = local.get(key)
+            if value is not None:
+                logger.debug(f"Cache hit (local): {key}")
+                return value
+
+            client = _get_redis()
+            if client is not None:
+                try:
+                    payload = client.get(key)
+                    if payload is not None:
+                        value = pickle.loads(payload)
+                        with local_lock:
+                            local[key] = value
+                        logger.debug(f"Cache hit (redis): {key}")
+                        return value
+                except Exception as e:
+                    _redis_failed("get", key, e)
+
+            logger.debug(f"Cache miss: {key}")
+            value = func(*args, **kwargs)
+            if _is_empty(value):
+                return value
+
+            with local_lock:
+                local[key] = value
+            # Re-check: a failed get above may have taken the Redis tier out
+            client = _get_redis()
+            if client is not None:
+                try:
+                    client.setex(key, seconds, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+                except Exception as e:
+                    _redis_failed("set", key, e)
+            return value
+
+        return wrapper
+    return decorator
@@ -1,13 +1,133 @@
 # services/stock_service.py
 import yfinance as yf
 import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Optional, Dict, Any, List
 import logging
+import math
+import socket
+import threading
 from datetime import datetime, timedelta
 import time
+from services.cache_service import cached
 
 logger = logging.getLogger(__name__)
 
+# Back-off (seconds) when Yahoo answers 429 without a usable Retry-After header
+RATE_LIMIT_BACKOFF = 30
+
+# Network failures worth retrying; anything else (including rate limits) is not
+TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout, socket.timeout)
+
+class RateLimitError(Exception):
+    """Yahoo Finance is throttling requests; callers should back off for retry_after seconds"""
+    def __init__(self, retry_after: int):
+        super().__init__(f"Yahoo Finance rate limit reached, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+_rate_limited_until = 0.0
+
+def _record_rate_limit(response, *args, **kwargs):
+    """Session response hook: remember how long Yahoo asked us to back off after a 429"""
+    global _rate_limited_until
+    if response.status_code == 429:
+        try:
+            retry_after = int(response.headers.get("Retry-After", RATE_LIMIT_BACKOFF))
+        except ValueError:
+            retry_after = RATE_LIMIT_BACKOFF
+        _rate_limited_until = max(_rate_limited_until, time.time() + retry_after)
+        logger.warning(f"Yahoo Finance rate limit hit, backing off for {retry_after}s")
+    return response
+
+def _check_rate_limit() -> None:
+    """Fail fast with RateLimitError instead of calling Yahoo during a back-off window"""
+    remaining = _rate_limited_until - time.time()
+    if remaining > 0:
+        raise RateLimitError(math.ceil(remaining))
+
+def _build_session() -> requests.Session:
+    """
+    HTTP session shared by all yfinance calls.
+    Reusing it keeps TLS connections and Yahoo's cookie/crumb alive between requests.
+    429s are not retried here; they are recorded by _record_rate_limit instead.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=32,
+        max_retries=Retry(total=3, backoff_factor=1, status_forcelist=[500, 502, 503, 504])
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.hooks["response"].append(_record_rate_limit)
+    return session
+
+YF_SESSION = _build_session()
+
+# Cache lifetimes (seconds)
+LATEST_CACHE_TTL = 60
+TICKER_INFO_CACHE_TTL = 5 * 60
+INFO_CACHE_TTL = 24 * 60 * 60
+# History is fetched by period, so every range ends today and its newest bar (daily, weekly
+# and monthly bars included) keeps moving until the close; only immutable ranges could live longer
+HISTORY_CACHE_TTL = 60
+
+# Column dtypes for fetched OHLCV frames
+OHLCV_DTYPES = {'open': 'float64', 'high': 'float64', 'low': 'float64', 'close': 'float64', 'volume': 'int64'}
+
+# Yahoo serves up to ~20 symbols per download request
+DOWNLOAD_CHUNK_SIZE = 20
+
+# yf.download collects results in module-global state (yfinance.shared._DFS/_ERRORS) that
+# every call resets, so multi-symbol downloads in one process must not overlap
+_DOWNLOAD_LOCK = threading.Lock()
+
+def _history(symbol: str, interval: str, **kwargs) -> pd.DataFrame:
+    """
+    Single-symbol OHLCV via Ticker.history, which (unlike yf.download) never resets yfinance's
+    shared state and so runs concurrently without _DOWNLOAD_LOCK.
+    Daily and longer bars drop their timezone, as yf.download does.
+    """
+    df = yf.Ticker(symbol, session=YF_SESSION).history(interval=interval, actions=False, **kwargs)
+    if not df.empty and interval[-1] not in ("m", "h"):
+        df.index = df.index.tz_localize(None)
+    return df
+
+@cached(ttl=TICKER_INFO_CACHE_TTL)
+def fetch_ticker_info(symbol: str) -> Dict[str, Any]:
+    """
+    Get the raw yfinance info dict for a symbol.
+    Each lookup is a separate, tightly rate-limited quoteSummary request, so results are cached
+    and shared by the latest-quote and company-info paths.
+    """
+    _check_rate_limit()
+    try:
+        return yf.Ticker(symbol, session=YF_SESSION).info
+    except Exception:
+        _check_rate_limit()
+        raise
+
+def _normalize_ohlcv(df: pd.DataFrame, symbol: str) -> pd.DataFrame:
+    """
+    Reduce a yfinance frame for one symbol to clean symbol/dt/open/high/low/close/volume rows.
+    """
+    # One projection copy; the index and column names are then changed in place
+    df = df.loc[:, ['Open', 'High', 'Low', 'Close', 'Volume']]
+    df.reset_index(inplace=True)
+    df.columns = ['dt', 'open', 'high', 'low', 'close', 'volume']
+    df['symbol'] = symbol.upper()
+    
+    # Clean data - remove rows with NaN values
+    df = df.dropna()
+    
+    # Prices stay float64 (float32 can't hold cents above ~100k, e.g. BRK-A); volume is integral
+    df = df.astype(OHLCV_DTYPES)
+    
+    return df[['symbol', 'dt', 'open', 'high', 'low', 'close', 'volume']]
+
+@cached(ttl=HISTORY_CACHE_TTL)
 def fetch_historical_ohlcv(symbol: str, period: str = "1y", interval: str = "1d") -> pd.DataFrame:
     """
     Fetch historical OHLCV data using yfinance.
@@ -23,52 +143,49 @@ def fetch_historical_ohlcv(symbol: str, period: str = "1y", interval: str = "1d"
         df = pd.DataFrame()
         
         for attempt in range(max_retries):
+            _check_rate_limit()
             try:
                 logger.info(f"Attempt {attempt + 1} for {symbol}")
                 
                 # Try different approaches if the first fails
                 if attempt == 0:
-                    # First attempt: standard download
-                    df = yf.download(
+                    # First attempt: standard fetch
+                    df = _history(
                         symbol, 
                         period=period, 
                         interval=interval, 
                         auto_adjust=False, 
-                        progress=False,
                         timeout=30
                     )
                 elif attempt == 1:
                     # Second attempt: try with auto_adjust=True
                     logger.info(f"Retrying {symbol} with auto_adjust=True")
-                    df = yf.download(
+                    df = _history(
                         symbol, 
                         period=period, 
                         interval=interval, 
                         auto_adjust=True, 
-                        progress=False,
                         timeout=30
                     )
                 elif attempt == 2:
                     # Third attempt: try with different period if 1y fails
                     if period == "1y":
                         logger.info(f"Retrying {symbol} with period=5d")
-                        df = yf.download(
+                        df = _history(
                             symbol, 
                             period="5d", 
                             interval=interval, 
                             auto_adjust=False, 
-                            progress=False,
                             timeout=30
                         )
                     else:
                         # Try with 1d period
                         logger.info(f"Retrying {symbol} with period=1d")
-                        df = yf.download(
+                        df = _history(
                             symbol, 
                             period="1d", 
                             interval=interval, 
                             auto_adjust=False, 
-                            progress=False,
                             timeout=30
                         )
                 
@@ -76,7 +193,7 @@ def fetch_historical_ohlcv(symbol: str, period: str = "1y", interval: str = "1d"
                     logger.info(f"Success on attempt {attempt + 1} for {symbol}")
                     break
                     
-            except Exception as e:
+            except TRANSIENT_ERRORS as e:
                 logger.warning(f"Attempt {attempt + 1} failed for {symbol}: {e}")
                 if attempt < max_retries - 1:
                     time.sleep(2 ** attempt)  # Exponential backoff
@@ -84,47 +201,35 @@ def fetch_historical_ohlcv(symbol: str, period: str = "1y", interval: str = "1d"
                     logger.error(f"All attempts failed for {symbol}")
         
         if df.empty:
+            _check_rate_limit()
             logger.warning(f"No data returned for {symbol} after all attempts")
             return pd.DataFrame()
         
         # Keep needed columns and reset index
         try:
-            df = df[['Open', 'High', 'Low', 'Close', 'Volume']].reset_index()
-            df.columns = ['dt', 'open', 'high', 'low', 'close', 'volume']
-            df['symbol'] = symbol.upper()
-            
-            # Clean data - remove rows with NaN values
-            df = df.dropna()
-            
-            # Ensure proper data types
-            df['open'] = pd.to_numeric(df['open'], errors='coerce')
-            df['high'] = pd.to_numeric(df['high'], errors='coerce')
-            df['low'] = pd.to_numeric(df['low'], errors='coerce')
-            df['close'] = pd.to_numeric(df['close'], errors='coerce')
-            df['volume'] = pd.to_numeric(df['volume'], errors='coerce')
-            
-            # Remove any remaining NaN rows
-            df = df.dropna()
-            
+            df = _normalize_ohlcv(df, symbol)
             logger.info(f"Successfully fetched {len(df)} records for {symbol} from Yahoo Finance")
-            return df[['symbol', 'dt', 'open', 'high', 'low', 'close', 'volume']]
+            return df
             
         except Exception as e:
             logger.error(f"Error processing data for {symbol}: {e}")
             return pd.DataFrame()
         
+    except RateLimitError:
+        raise
     except Exception as e:
         logger.error(f"Error fetching historical data for {symbol}: {e}")
         return pd.DataFrame()
 
+@cached(ttl=LATEST_CACHE_TTL)
 def fetch_realtime_latest(symbol: str, period: str = "1d", interval: str = "1m") -> Dict[str, Any]:
     """
     Get the latest available minute candle for today (near real-time).
     """
     try:
         logger.info(f"Fetching real-time data for {symbol}")
+        _check_rate_limit()
         
-        # Try to get the latest data
         df = fetch_historical_ohlcv(symbol, period=period, interval=interval)
         if df.empty:
             logger.warning(f"No real-time data available for {symbol}")
@@ -134,8 +239,9 @@ def fetch_realtime_latest(symbol: str, period: str = "1d", interval: str = "1m")
         
         # Get additional info from yfinance
         try:
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
+            info = fetch_ticker_info(symbol)
+        except RateLimitError:
+            raise
         except Exception as e:
             logger.warning(f"Could not fetch ticker info for {symbol}: {e}")
             info = {}
@@ -159,35 +265,91 @@ def fetch_realtime_latest(symbol: str, period: str = "1d", interval: str = "1m")
         logger.info(f"Successfully fetched real-time data for {symbol} from Yahoo Finance")
         return result
         
+    except RateLimitError:
+        raise
     except Exception as e:
         logger.error(f"Error fetching real-time data for {symbol}: {e}")
         return {}
 
-def fetch_multiple_symbols(symbols: List[str], period: str = "1d", interval: str = "1h") -> Dict[str, pd.DataFrame]:
+def _fetch_chunk(symbols: List[str], period: str, interval: str) -> Dict[str, pd.DataFrame]:
     """
-    Fetch data for multiple symbols concurrently.
+    Download a chunk of symbols with a single yfinance request and split the result per symbol.
     """
+    max_retries = 3
+    df = pd.DataFrame()
+    
+    for attempt in range(max_retries):
+        _check_rate_limit()
+        try:
+            with _DOWNLOAD_LOCK:
+                df = yf.download(
+                    symbols, 
+                    period=period, 
+                    interval=interval, 
+                    group_by='ticker',
+                    threads=True,
+                    auto_adjust=False, 
+                    progress=False,
+                    timeout=30,
+                    session=YF_SESSION
+                )
+            # An empty frame is an answer (invalid/delisted symbols), not a reason to retry
+            break
+        except TRANSIENT_ERRORS as e:
+            logger.warning(f"Attempt {attempt + 1} failed for {symbols}: {e}")
+            if attempt < max_retries - 1:
+                time.sleep(2 ** attempt)  # Exponential backoff
+    
     results = {}
+    if df.empty:
+        _check_rate_limit()
+        logger.warning(f"No data returned for {symbols}")
+        return results
+    
     for symbol in symbols:
         try:
-            df = fetch_historical_ohlcv(symbol, period=period, interval=interval)
-            if not df.empty:
-                results[symbol] = df
-            else:
-                logger.warning(f"No data for {symbol}")
+            # Multi-symbol downloads have (ticker, field) columns; single-symbol ones are flat
+            frame = df[symbol.upper()] if isinstance(df.columns, pd.MultiIndex) else df
+            frame = _normalize_ohlcv(frame, symbol)
         except Exception as e:
-            logger.error(f"Error fetching {symbol}: {e}")
+            logger.error(f"Error processing data for {symbol}: {e}")
+            continue
+        if not frame.empty:
+            results[symbol] = frame
+        else:
+            logger.warning(f"No data for {symbol}")
     
     return results
 
+@cached(ttl=HISTORY_CACHE_TTL)
+def fetch_multiple_symbols(symbols: List[str], period: str = "1d", interval: str = "1h") -> Dict[str, pd.DataFrame]:
+    """
+    Fetch data for multiple symbols.
+    Symbols are downloaded DOWNLOAD_CHUNK_SIZE at a time, one yfinance request per chunk.
+    Chunks run one after another (yf.download can't run concurrently, see _DOWNLOAD_LOCK);
+    yfinance's threads=True already fetches the symbols within a chunk in parallel.
+    """
+    results = {}
+    for start in range(0, len(symbols), DOWNLOAD_CHUNK_SIZE):
+        chunk = symbols[start:start + DOWNLOAD_CHUNK_SIZE]
+        try:
+            results.update(_fetch_chunk(chunk, period, interval))
+        except RateLimitError:
+            raise
+        except Exception as e:
+            logger.error(f"Error fetching {chunk}: {e}")
+    
+    # Keep the caller's symbol order
+    return {symbol: results[symbol] for symbol in symbols if symbol in results}
+
+@cached(ttl=INFO_CACHE_TTL)
 def get_symbol_info(symbol: str) -> Dict[str, Any]:
     """
     Get basic information about a symbol.
     """
     try:
         logger.info(f"Fetching symbol info for {symbol}")
-        ticker = yf.Ticker(symbol)
-        info = ticker.info
+        info = fetch_ticker_info(symbol)
         
         result = {
             "symbol": symbol.upper(),
@@ -205,6 +367,8 @@ def get_symbol_info(symbol: str) -> Dict[str, Any]:
         logger.info(f"Successfully fetched symbol info for {symbol}")
         return result
         
+    except RateLimitError:
+        raise
     except Exception as e:
         logger.error(f"Error fetching symbol info for {symbol}: {e}")
         return {}
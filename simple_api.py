@@ -4,6 +4,7 @@ Very Simple Stock API - Minimal dependencies
 """
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 import uvicorn
 import logging
 from datetime import datetime
@@ -17,7 +18,8 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="Simple Stock API",
     description="Basic API for testing - fetches data from Yahoo Finance",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -30,7 +32,7 @@ app.add_middleware(
 )
 
 @app.get("/")
-def root():
+async def root():
     """Root endpoint"""
     return {
         "message": "Simple Stock API is running!",
@@ -46,7 +48,7 @@ def root():
     }
 
 @app.get("/test")
-def test_endpoint():
+async def test_endpoint():
     """Simple test endpoint"""
     return {
         "message": "API is working!",
@@ -55,7 +57,7 @@ def test_endpoint():
     }
 
 @app.get("/health")
-def health_check():
+async def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
@@ -64,7 +66,7 @@ def health_check():
     }
 
 @app.get("/stock/{symbol}")
-def get_stock_data(symbol: str):
+async def get_stock_data(symbol: str):
     """Get basic stock data for a symbol"""
     try:
         logger.info(f"Fetching data for {symbol}")
@@ -82,7 +84,7 @@ def get_stock_data(symbol: str):
         raise HTTPException(status_code=500, detail=f"Failed to process request for {symbol}")
 
 @app.get("/stock/{symbol}/info")
-def get_stock_info(symbol: str):
+async def get_stock_info(symbol: str):
     """Get company information for a symbol"""
     try:
         logger.info(f"Fetching company info for {symbol}")
@@ -102,7 +104,7 @@ def get_stock_info(symbol: str):
         raise HTTPException(status_code=500, detail=f"Failed to fetch company information for {symbol}")
 
 @app.get("/ping")
-def ping():
+async def ping():
     """Simple ping endpoint"""
     return {"pong": True, "timestamp": datetime.now().isoformat()}
 
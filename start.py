@@ -5,6 +5,7 @@ Startup script for iMarketPredict Stock API
 import os
 import sys
 import logging
+from importlib.util import find_spec
 from pathlib import Path
 
 # Add the project root to Python path
@@ -30,11 +31,13 @@ def check_dependencies():
         'mysqlclient'
     ]
     
+    # Distribution names whose importable module is named differently
+    module_names = {'mysqlclient': 'MySQLdb'}
+    
+    # find_spec only locates the module; it doesn't execute pandas/sqlalchemy at startup
     missing_packages = []
     for package in required_packages:
-        try:
-            __import__(package)
-        except ImportError:
+        if find_spec(module_names.get(package, package)) is None:
             missing_packages.append(package)
     
     if missing_packages:
@@ -75,12 +78,15 @@ def main():
         from main import app
         import uvicorn
         
-        logger.info("Starting FastAPI server...")
+        # No auto-reload here: it forces a single process; use WEB_CONCURRENCY workers instead
+        workers = int(os.getenv("WEB_CONCURRENCY", (os.cpu_count() or 1) * 2 + 1))
+        logger.info(f"Starting FastAPI server with {workers} workers...")
         uvicorn.run(
             "main:app",
             host="0.0.0.0",
             port=8000,
-            reload=True,
+            reload=False,
+            workers=workers,
             log_level="info"
         )
     except Exception as e:
@@ -24,14 +24,18 @@ def main():
     print("Press Ctrl+C to stop the server")
     print("=" * 60)
     
-    # Always disable reload for stability
+    # Always disable reload for stability; scale with worker processes instead
+    workers = int(os.getenv("WEB_CONCURRENCY", max(2, os.cpu_count() or 1)))
+    
+    # loop/http stay at uvicorn's "auto", which picks uvloop/httptools whenever they are installed
     try:
         uvicorn.run(
             "main:app", 
             host="0.0.0.0", 
             port=8000,  # Back to original port 8000
             reload=False,  # Disable reload for stability
-            log_level="info"
+            workers=workers,
+            log_level="warning"
         )
     except Exception as e:
         print(f"Error starting server: {e}")
@@ -1,24 +1,58 @@
 #!/usr/bin/env python3
 """
 Simple test API for iMarketPredict Stock API - works without database
+Fallback for run_api.py when the Full API's packages are missing, so it only needs
+fastapi, uvicorn, yfinance and pandas and doesn't import services/*
 """
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
 import yfinance as yf
 import pandas as pd
-from typing import Optional
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Any, Dict, Optional
 import uvicorn
 import logging
+import asyncio
+import functools
+import threading
+import time
+from collections import OrderedDict
+from importlib.util import find_spec
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Response cache TTLs (seconds) for identical symbol/period/interval queries
+HISTORY_CACHE_TTL = 60
+LATEST_CACHE_TTL = 10
+INFO_CACHE_TTL = 5 * 60
+
+# Max entries per cached function; the oldest entry is evicted beyond this
+CACHE_MAX_ENTRIES = 512
+
+# One pooled session for all yfinance calls, so TLS connections and Yahoo's cookie/crumb are reused
+YF_SESSION = requests.Session()
+YF_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=1, status_forcelist=[500, 502, 503, 504])
+))
+
+# Dedicated pool for blocking yfinance/pandas work so the default executor isn't starved
+YF_EXECUTOR = ThreadPoolExecutor(max_workers=32, thread_name_prefix="yfinance")
+
 app = FastAPI(
     title="iMarketPredict Stock API (Test Version)",
     description="Simple API for fetching stock data from Yahoo Finance - No Database Required",
-    version="1.0.0"
+    version="1.0.0",
+    # ORJSONResponse only needs orjson when rendering, so the fallback still runs without it
+    default_response_class=ORJSONResponse if find_spec("orjson") else JSONResponse
 )
 
 # Add CORS middleware
@@ -30,8 +64,49 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def _ttl_cache(seconds: int):
+    """
+    Small in-process TTL memo for the Yahoo lookups below, keyed by (SYMBOL, *args).
+    Holds at most CACHE_MAX_ENTRIES, evicting the oldest; exceptions and empty results are not cached.
+    """
+    def decorator(func):
+        entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        lock = threading.Lock()
+        
+        @functools.wraps(func)
+        def wrapper(symbol: str, *args):
+            symbol = symbol.upper()
+            key = (symbol, *args)
+            now = time.monotonic()
+            with lock:
+                entry = entries.get(key)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+            
+            value = func(symbol, *args)
+            if len(value):
+                with lock:
+                    # Re-inserted keys move to the end, so entries stay oldest-first
+                    entries.pop(key, None)
+                    entries[key] = (now + seconds, value)
+                    while len(entries) > CACHE_MAX_ENTRIES:
+                        entries.popitem(last=False)
+            return value
+        return wrapper
+    return decorator
+
+@_ttl_cache(INFO_CACHE_TTL)
+def _ticker_info(symbol: str) -> Dict[str, Any]:
+    """Raw yfinance info dict for a symbol (a separate, tightly rate-limited quoteSummary request)"""
+    return yf.Ticker(symbol, session=YF_SESSION).info
+
+async def _run_blocking(func, *args, **kwargs):
+    """Run a blocking call on YF_EXECUTOR without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(YF_EXECUTOR, functools.partial(func, *args, **kwargs))
+
 @app.get("/")
-def root():
+async def root():
     """Root endpoint with API information"""
     return {
         "message": "iMarketPredict Stock API (Test Version)",
@@ -42,6 +117,7 @@ def root():
         "endpoints": {
             "health": "/health",
             "stock_history": "/stock/{symbol}/history",
+            "stock_history_arrow": "/stock/{symbol}/history.arrow",
             "stock_latest": "/stock/{symbol}/latest",
             "stock_info": "/stock/{symbol}/info"
         },
@@ -49,7 +125,7 @@ def root():
     }
 
 @app.get("/health")
-def health_check():
+async def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
@@ -58,8 +134,37 @@ def health_check():
         "message": "API is running in test mode without database"
     }
 
+@_ttl_cache(HISTORY_CACHE_TTL)
+def _download_history(symbol: str, period: str, interval: str) -> pd.DataFrame:
+    """Download OHLCV history from Yahoo Finance into dt/open/high/low/close/volume/symbol columns"""
+    # Ticker.history rather than yf.download: download resets yfinance's module-global
+    # results on every call, so concurrent downloads on YF_EXECUTOR would clobber each other
+    df = yf.Ticker(symbol, session=YF_SESSION).history(
+        period=period, 
+        interval=interval, 
+        auto_adjust=False, 
+        actions=False,
+        timeout=30
+    )
+    
+    if df.empty:
+        raise HTTPException(status_code=404, detail=f"No data found for symbol {symbol}")
+    
+    # Daily and longer bars without a timezone, as yf.download returns them
+    if interval[-1] not in ("m", "h"):
+        df.index = df.index.tz_localize(None)
+    
+    # Process the data
+    df = df.loc[:, ['Open', 'High', 'Low', 'Close', 'Volume']]
+    df.reset_index(inplace=True)
+    df.columns = ['dt', 'open', 'high', 'low', 'close', 'volume']
+    df['symbol'] = symbol.upper()
+    
+    # Clean data
+    return df.dropna()
+
 @app.get("/stock/{symbol}/history")
-def get_history(
+async def get_history(
     symbol: str, 
     period: str = "1d",
     interval: str = "1h",
@@ -70,35 +175,17 @@ def get_history(
         logger.info(f"Fetching history for {symbol} - period: {period}, interval: {interval}")
         
         # Fetch data from Yahoo Finance
-        df = yf.download(
-            symbol, 
-            period=period, 
-            interval=interval, 
-            auto_adjust=False, 
-            progress=False,
-            timeout=30
-        )
-        
-        if df.empty:
-            raise HTTPException(status_code=404, detail=f"No data found for symbol {symbol}")
+        df = await _run_blocking(_download_history, symbol, period, interval)
         
-        # Process the data
-        df = df[['Open', 'High', 'Low', 'Close', 'Volume']].reset_index()
-        df.columns = ['dt', 'open', 'high', 'low', 'close', 'volume']
-        df['symbol'] = symbol.upper()
-        
-        # Clean data
-        df = df.dropna()
-        
-        # Convert to response format
-        data = df.to_dict(orient="records")
+        # Slice before converting so only the returned rows become dicts
+        data = df.tail(limit).to_dict(orient="records") if limit else df.to_dict(orient="records")
         
         return {
             "symbol": symbol.upper(),
             "period": period,
             "interval": interval,
-            "total_records": len(data),
-            "rows": data[-limit:] if limit else data,
+            "total_records": len(df),
+            "rows": data,
             "timestamp": datetime.now().isoformat(),
             "stored": False
         }
@@ -107,42 +194,79 @@ def get_history(
         logger.error(f"Error fetching history for {symbol}: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch data for {symbol}: {str(e)}")
 
-@app.get("/stock/{symbol}/latest")
-def get_latest(symbol: str):
-    """Get latest real-time data for a symbol"""
+@app.get("/stock/{symbol}/history.arrow")
+async def get_history_arrow(
+    symbol: str, 
+    period: str = "1d",
+    interval: str = "1h",
+    limit: Optional[int] = None
+):
+    """Get historical OHLCV data as an Arrow IPC stream (columnar, no per-row objects)"""
     try:
-        logger.info(f"Fetching latest data for {symbol}")
+        import pyarrow as pa
         
-        # Get latest data
-        df = yf.download(symbol, period="1d", interval="1m", auto_adjust=False, progress=False)
+        logger.info(f"Fetching Arrow history for {symbol} - period: {period}, interval: {interval}")
         
-        if df.empty:
-            raise HTTPException(status_code=404, detail=f"No real-time data found for symbol {symbol}")
+        df = await _run_blocking(_download_history, symbol, period, interval)
+        if limit:
+            df = df.tail(limit)
         
-        latest = df.tail(1).iloc[0]
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
         
-        # Get additional info
-        try:
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
-        except:
-            info = {}
+        return Response(
+            content=sink.getvalue().to_pybytes(),
+            media_type="application/vnd.apache.arrow.stream"
+        )
         
-        result = {
-            "symbol": symbol.upper(),
-            "dt": latest.name.strftime("%Y-%m-%d %H:%M:%S"),
-            "open": float(latest['Open']),
-            "high": float(latest['High']),
-            "low": float(latest['Low']),
-            "close": float(latest['Close']),
-            "volume": float(latest['Volume']),
-            "company_name": info.get('longName', ''),
-            "sector": info.get('sector', ''),
-            "market_cap": info.get('marketCap', ''),
-            "currency": info.get('currency', 'USD'),
-            "exchange": info.get('exchange', ''),
-            "fetch_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching Arrow history for {symbol}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch data for {symbol}: {str(e)}")
+
+@_ttl_cache(LATEST_CACHE_TTL)
+def _fetch_latest(symbol: str) -> Dict[str, Any]:
+    """Build the latest quote for a symbol from the last 1m candle plus company info"""
+    df = yf.Ticker(symbol, session=YF_SESSION).history(period="1d", interval="1m", auto_adjust=False, actions=False)
+    
+    if df.empty:
+        raise HTTPException(status_code=404, detail=f"No real-time data found for symbol {symbol}")
+    
+    latest = df.tail(1).iloc[0]
+    
+    # Get additional info
+    try:
+        info = _ticker_info(symbol)
+    except:
+        info = {}
+    
+    return {
+        "symbol": symbol.upper(),
+        "dt": latest.name.strftime("%Y-%m-%d %H:%M:%S"),
+        "open": float(latest['Open']),
+        "high": float(latest['High']),
+        "low": float(latest['Low']),
+        "close": float(latest['Close']),
+        "volume": float(latest['Volume']),
+        "company_name": info.get('longName', ''),
+        "sector": info.get('sector', ''),
+        "market_cap": info.get('marketCap', ''),
+        "currency": info.get('currency', 'USD'),
+        "exchange": info.get('exchange', ''),
+        "fetch_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+@app.get("/stock/{symbol}/latest")
+async def get_latest(symbol: str):
+    """Get latest real-time data for a symbol"""
+    try:
+        logger.info(f"Fetching latest data for {symbol}")
+        
+        # Get latest data (cached for LATEST_CACHE_TTL seconds)
+        result = await _run_blocking(_fetch_latest, symbol)
         
         return {
             **result,
@@ -155,13 +279,12 @@ def get_latest(symbol: str):
         raise HTTPException(status_code=500, detail=f"Failed to fetch latest data for {symbol}: {str(e)}")
 
 @app.get("/stock/{symbol}/info")
-def get_stock_info(symbol: str):
+async def get_stock_info(symbol: str):
     """Get company information for a symbol"""
     try:
         logger.info(f"Fetching company info for {symbol}")
         
-        ticker = yf.Ticker(symbol)
-        info = ticker.info
+        info = await _run_blocking(_ticker_info, symbol)
         
         if not info:
             raise HTTPException(status_code=404, detail=f"No company information found for symbol {symbol}")
@@ -189,7 +312,7 @@ def get_stock_info(symbol: str):
         raise HTTPException(status_code=500, detail=f"Failed to fetch company information for {symbol}: {str(e)}")
 
 @app.get("/test")
-def test_endpoint():
+async def test_endpoint():
     """Simple test endpoint"""
     return {
         "message": "API is working!",